@@ -11,8 +11,12 @@ and CDC life tables to estimate chance of death.
 
 """
 
+import os
+import warnings
+
 import numpy as np
 from scipy.optimize import brentq
+from scipy.interpolate import PchipInterpolator
 import pandas as pd
 import uncertainties as unc
 import uncertainties.unumpy as unp
@@ -24,8 +28,9 @@ from itertools import cycle
 lines = ["-","--","-.",":"]
 linecycler = cycle(lines)
 
-from cdc_life_tables import life_table
+from cdc_life_tables import life_table, groups_long2short
 import shiller
+from sobol import scrambled_sobol
 
 # Historical financial data
 inflation = shiller.inflation.iloc[1:-1]
@@ -34,6 +39,124 @@ interest_rates = shiller.interest_rates.iloc[1:-1]
 
 rand = np.random.random_sample
 
+# Stored surrogates of how_much_to_save, one file per life table
+surrogate_dir = 'surrogates/'
+
+try:
+    surrogate_dir = os.path.join(os.path.dirname(__file__), surrogate_dir)
+except NameError:
+    pass
+
+surrogate_cache = {}
+
+# Relative tolerance to which how_much_to_save solves for the savings
+save_rtol = 1e-2
+
+# Log-spaced asset bins, relative to the starting assets, used to find
+# per-age median assets without keeping the histories. 100 bins per
+# decade resolve the median to about 2%. Assets outside the range are
+# counted in the edge bins.
+curve_asset_bins = np.logspace(-3, 3, 601)
+
+variance_reductions = ['mc', 'antithetic', 'stratified', 'sobol']
+
+
+def check_variance_reduction(variance_reduction):
+    """
+    Raise ValueError unless variance_reduction is a known mode.
+    """
+    if variance_reduction not in variance_reductions:
+        raise ValueError('"{}" not a variance reduction mode.'.format(
+                              variance_reduction))
+
+
+def uniform_draws(n_mc, n_dims, variance_reduction='mc', n_replicates=8):
+    """
+    Uniform random numbers driving the Monte Carlo histories, one row
+    per history. Column 0 picks the age at death, the remaining columns
+    pick the historical year for each year of life.
+
+    Inputs:
+
+       * n_mc : the number of Monte Carlo histories
+       * n_dims : the number of uniforms per history
+       * variance_reduction : one of
+
+           - 'mc' : plain pseudo-random draws
+           - 'antithetic' : pairs of histories using u and 1-u; n_mc
+                              is rounded up to an even number
+           - 'stratified' : one draw per equal-probability stratum of
+                              the age at death, in each replicate
+           - 'sobol' : independently scrambled Sobol' sequences,
+                         one per replicate; each replicate is rounded
+                         up to a power of 2 points, so n_mc becomes
+                         n_replicates * 2**ceil(log2(n_mc/n_replicates))
+
+       * n_replicates : number of independent replicates for
+                          'stratified' and 'sobol'
+
+    Output:
+       * array of shape (n_mc, n_dims) with values in [0, 1)
+       * array of group labels; the group means are independent and
+           identically distributed, so their spread gives the error
+
+    """
+
+    check_variance_reduction(variance_reduction)
+
+    if variance_reduction == 'mc':
+        return rand((n_mc, n_dims)), np.arange(n_mc)
+
+    if variance_reduction == 'antithetic':
+        n_pairs = (n_mc + 1) // 2
+        half = rand((n_pairs, n_dims))
+        u = np.empty((2*n_pairs, n_dims))
+        u[0::2] = half
+        u[1::2] = 1.0 - half
+        return u, np.arange(2*n_pairs) // 2
+
+    n_replicates = max(1, min(n_replicates, n_mc))
+
+    if variance_reduction == 'sobol':
+        # Sobol' points are only balanced in blocks of a power of 2
+        log2_m = int(np.ceil(np.log2(np.ceil(n_mc / float(n_replicates)))))
+        u = np.concatenate([scrambled_sobol(log2_m, n_dims)
+                            for r in range(n_replicates)])
+        return u, np.repeat(np.arange(n_replicates), 1 << log2_m)
+
+    replicates = np.array_split(np.arange(n_mc), n_replicates)
+
+    u = np.empty((n_mc, n_dims))
+    groups = np.empty(n_mc, dtype=int)
+
+    for r, rows in enumerate(replicates):
+        m = rows.size
+        groups[rows] = r
+
+        u[rows] = rand((m, n_dims))
+        u[rows, 0] = (np.random.permutation(m) + rand(m)) / m
+
+    return u, groups
+
+
+def death_cdf(table, starting_age):
+    """
+    Inputs:
+      * table - life table q values, as from cdc_life_tables.life_table
+      * starting_age - the subject's current age
+
+    Returns:
+      * numpy array, probability of having died by the end of each year
+          of life counted from starting_age. Everyone dies at 110.
+    """
+    n_years = max(0, int(np.ceil(110 - starting_age)))
+    ages = starting_age + np.arange(n_years)
+
+    q = np.ones(n_years + 1)
+    q[:n_years] = np.asarray(table)[ages.astype(int)]
+
+    return 1.0 - np.cumprod(1.0 - q)
+
 
 def run_histories(starting_assets, 
                   yearly_expense,
@@ -41,7 +164,8 @@ def run_histories(starting_assets,
                   starting_age,
                   state_abbrev,
                   demographic_group,
-                  n_mc=1000, plotting=False, verbose=False):
+                  n_mc=1000, plotting=False, verbose=False, curves=False,
+                  variance_reduction='mc', n_replicates=8):
     """
     Run a Monte Carlo simulation for a person starting with the given
     amount of assets in savings. The yearly_expense are withdrawn 
@@ -70,49 +194,86 @@ def run_histories(starting_assets,
        * n_mc : the number of Monte Carlo histories
        * plotting : produce a plot showing the Monte Carlo histories
        * verbose : produce verbose diagnostic messages
+       * curves : also return per-age curves, see age_curves
+       * variance_reduction : sampling scheme, see uniform_draws
+       * n_replicates : number of randomized replicates used for the
+                          error estimate of 'stratified' and 'sobol'
 
     Output:
        * probability of running out of money
+       * pandas.DataFrame of per-age curves, only if curves is True
 
     """
 
+    check_variance_reduction(variance_reduction)
+
     # Life table
     table = life_table(state_abbrev, demographic_group)
 
+    cdf = death_cdf(table, starting_age)
+    n_years = cdf.size - 1
+
+    # Columns: age at death, one historical year per year of life,
+    # and the point in the final year at which death happens.
+    u, groups = uniform_draws(n_mc, n_years + 2,
+                              variance_reduction, n_replicates)
+    n_mc = u.shape[0]
+
+    # Age at death by inverting the cumulative probability of dying
+    death_years = np.searchsorted(cdf, u[:, 0])
+
+    # Past years sorted by portfolio return, so nearby uniforms pick
+    # similar years; this is what lets antithetic and QMC draws pay off.
+    growth = (stock_fraction*stock_returns.values
+              + (1-stock_fraction)*interest_rates.values
+              - inflation.values)
+    years = np.argsort(growth)
+    year_picks = np.minimum((u[:, 1:-1]*inflation.size).astype(int),
+                            inflation.size-1)
+    year_picks = years[year_picks]
+
     mc_histories = []
+    final_assets = []
+
+    if curves:
+        # Bins need a positive scale; with nothing to start with every
+        # solvent history sits in the lowest bin.
+        asset_scale = starting_assets if starting_assets > 0 else 1.0
+        asset_edges = asset_scale * curve_asset_bins
+        asset_hist = np.zeros((n_years + 1, asset_edges.size - 1), dtype=int)
+        ruin_years = []
 
     for i in range(n_mc):
 
-        age = starting_age
         current_assets = starting_assets
         expenses_per_year = yearly_expense
 
         assets = [current_assets]
+        year = 0
 
         # Loop over years
         while current_assets > 0:
 
             # Death this year.
-            if age >= 110 or rand() <= table[int(age)]:
+            if year == death_years[i]:
                 # Die at random point in year
-                current_assets -= expenses_per_year*rand()
+                current_assets -= expenses_per_year*u[i, -1]
                 break
 
             # Subtracting expenses for year
             current_assets -= expenses_per_year
 
-            # Pick past year by random to base inflation, stock return data
-            i = np.random.randint(inflation.size, size=1)
-            i = int(i)
+            # Past year to base inflation, stock return data
+            j = year_picks[i, year]
 
             # Adjust expenses for inflation.
-            expenses_per_year *= 1.0+inflation.iloc[i]
+            expenses_per_year *= 1.0+inflation.iloc[j]
 
             # Adding stock investment increase
-            stock_gains = stock_returns.iloc[i] * (current_assets*stock_fraction)
+            stock_gains = stock_returns.iloc[j] * (current_assets*stock_fraction)
 
             # Adding bond investment increase
-            bond_gains = interest_rates.iloc[i] * (current_assets*(1-stock_fraction))
+            bond_gains = interest_rates.iloc[j] * (current_assets*(1-stock_fraction))
 
             current_assets += stock_gains
             current_assets += bond_gains
@@ -121,12 +282,25 @@ def run_histories(starting_assets,
             assets.append(current_assets)
 
             # Getting old
-            age += 1.0
+            year += 1
 
 
         assets = np.array(assets)
 
-        mc_histories.append( (assets) )
+        if plotting:
+            mc_histories.append( (assets) )
+
+        final_assets.append(assets[-1])
+
+        if curves:
+            # Count solvent assets per year of life in asset bins
+            solvent = assets[assets >= 0.0]
+            bins = np.clip(np.searchsorted(asset_edges, solvent) - 1,
+                           0, asset_edges.size - 2)
+            np.add.at(asset_hist, (np.arange(solvent.size), bins), 1)
+
+            if assets[-1] < 0.0:
+                ruin_years.append(assets.size - 1)
 
 
     if plotting:
@@ -137,16 +311,16 @@ def run_histories(starting_assets,
         plt.figure()
 
         final_ages = []
-        final_assets = []
+        last_assets = []
         for i in range(n_mc):
             y = mc_histories[i] / 1e6
             x = np.arange(starting_age, starting_age+y.size)
             plt.plot(x, y, color='gray', linewidth=0.5)
 
-            final_assets.append(y[-1])
+            last_assets.append(y[-1])
             final_ages.append(x[-1])
 
-        plt.plot(final_ages, final_assets, color='red', ls=':',
+        plt.plot(final_ages, last_assets, color='red', ls=':',
                  marker='.', markersize=1.5)
 
         plt.xlabel('Age')
@@ -171,23 +345,109 @@ def run_histories(starting_assets,
 
         # plt.savefig('figs/final-age.pdf')
 
-    else:
-        final_assets = []
-        for i in range(n_mc):
-            final_assets.append(mc_histories[i][-1])
-
     final_assets = np.array(final_assets)
 
     run_out_of_money_hist = np.array(final_assets < 0.0, dtype=np.float64)
-    run_out_of_money = unc.ufloat(run_out_of_money_hist.mean(),
-                                  run_out_of_money_hist.std()/np.sqrt(n_mc))
+
+    # Error from the spread of independent group means
+    group_means = (np.bincount(groups, weights=run_out_of_money_hist)
+                   / np.bincount(groups))
+    n_groups = group_means.size
+
+    if variance_reduction == 'mc' or n_groups < 2:
+        run_out_of_money = unc.ufloat(run_out_of_money_hist.mean(),
+                                      run_out_of_money_hist.std()/np.sqrt(n_mc))
+    else:
+        run_out_of_money = unc.ufloat(run_out_of_money_hist.mean(),
+                                      group_means.std(ddof=1)/np.sqrt(n_groups))
 
     if verbose:
         print ' Chance of running out of money is {:%}'.format(run_out_of_money)
 
+    if curves:
+        return run_out_of_money, age_curves(death_years, ruin_years,
+                                            asset_hist, asset_edges,
+                                            starting_age)
+
     return run_out_of_money
 
 
+def age_curves(death_years, ruin_years, asset_hist, asset_edges,
+               starting_age):
+    """
+    Turn the per-year tallies accumulated by run_histories into per-age
+    curves. Everything is counted with np.bincount or histograms, so no
+    asset histories are kept.
+
+    Inputs:
+
+       * death_years : year of life, counted from starting_age, in which
+                         each history dies
+       * ruin_years : year of life in which each ruined history ran
+                        out of money
+       * asset_hist : counts of solvent histories per year of life (rows)
+                        and asset bin (columns)
+       * asset_edges : edges of the asset bins
+       * starting_age : the subject's age at the start of every history
+
+    Output:
+       * pandas.DataFrame indexed by age with columns
+
+           - prob_alive : probability of being alive at that age
+           - prob_alive_solvent : probability of being alive with money left
+           - prob_ruined : probability of having run out of money at or
+                             before that age
+           - median_assets : median assets of those alive and solvent,
+                               interpolated within the asset bins, so
+                               accurate to about 2%. Assets outside the
+                               bins are counted in the edge bins, so a
+                               median falling in an edge bin is NaN.
+
+    """
+
+    n_mc = len(death_years)
+    n_ages = asset_hist.shape[0]
+
+    # Alive at every age up to and including the year of death
+    deaths = np.bincount(death_years, minlength=n_ages)
+    alive = deaths[::-1].cumsum()[::-1]
+
+    alive_solvent = asset_hist.sum(axis=1)
+
+    ruin = np.bincount(np.array(ruin_years, dtype=int),
+                       minlength=n_ages).cumsum()
+
+    # Median from the cumulative histogram, interpolating in log assets
+    # within the bin holding the middle history.
+    cum = asset_hist.cumsum(axis=1)
+    log_edges = np.log(asset_edges)
+
+    median_assets = np.empty(n_ages)
+    median_assets.fill(np.nan)
+    for k in np.nonzero(alive_solvent)[0]:
+        half = 0.5*alive_solvent[k]
+        b = np.searchsorted(cum[k], half)
+
+        # Edge bins also hold clipped values; their median is unknown
+        if b == 0 or b == asset_hist.shape[1] - 1: continue
+
+        frac = (half - (cum[k, b] - asset_hist[k, b])) / asset_hist[k, b]
+        median_assets[k] = np.exp(log_edges[b]
+                                  + frac*(log_edges[b+1] - log_edges[b]))
+
+    ages = starting_age + np.arange(n_ages)
+
+    return pd.DataFrame({
+                          'prob_alive'         : alive / float(n_mc),
+                          'prob_alive_solvent' : alive_solvent / float(n_mc),
+                          'prob_ruined'        : ruin / float(n_mc),
+                          'median_assets'      : median_assets,
+                        },
+                        index=pd.Index(ages, name='age'),
+                        columns=['prob_alive', 'prob_alive_solvent',
+                                 'prob_ruined', 'median_assets'])
+
+
 def how_much_to_save(
                      acceptable_risk=0.01,
                      yearly_expense=40e3,
@@ -195,7 +455,8 @@ def how_much_to_save(
                      starting_age=65,
                      state_abbrev='CA',
                      demographic_group='total',
-                     n_mc=500, plotting=False, verbose=False):
+                     n_mc=500, plotting=False, verbose=False,
+                     variance_reduction='mc', n_replicates=8):
     """
     Computes f(x) = f_0, where f is the MC simulation of the retirement
     process returning the probability of running out of money and
@@ -216,6 +477,8 @@ def how_much_to_save(
        * n_mc : the number of Monte Carlo histories
        * plotting : produce a plot showing the Monte Carlo histories
        * verbose : produce verbose diagnostic messages
+       * variance_reduction : sampling scheme, see uniform_draws
+       * n_replicates : number of randomized replicates, see run_histories
 
     Output:
 
@@ -223,11 +486,16 @@ def how_much_to_save(
 
     """
 
+    # Bad modes would otherwise look like a failed bracket below
+    check_variance_reduction(variance_reduction)
+
     def f(x):
         prob_outlive_savings = run_histories(x, yearly_expense, stock_fraction,
                                              starting_age, state_abbrev,
                                              demographic_group,
-                                             n_mc=n_mc, plotting=False, verbose=False)
+                                             n_mc=n_mc, plotting=False, verbose=False,
+                                             variance_reduction=variance_reduction,
+                                             n_replicates=n_replicates)
         return acceptable_risk - prob_outlive_savings.nominal_value
 
     lo_bound = 5.0*yearly_expense
@@ -235,7 +503,7 @@ def how_much_to_save(
 
     while True:
         try:
-            res = brentq(f, lo_bound, hi_bound, rtol=1e-2, full_output=True)
+            res = brentq(f, lo_bound, hi_bound, rtol=save_rtol, full_output=True)
             break
         except ValueError:
             n_mc *= 2
@@ -245,6 +513,289 @@ def how_much_to_save(
     return res[0]
 
 
+def surrogate_file(state_abbrev, demographic_group):
+    """
+    Path of the stored surrogate for a life table.
+    """
+    demographic_group = demographic_group.lower()
+    demographic_group = groups_long2short.get(demographic_group,
+                                              demographic_group)
+
+    return '{}{}_{}.npz'.format(surrogate_dir, state_abbrev.upper(),
+                                demographic_group)
+
+
+def surrogate_interp(axes, values, point):
+    """
+    Tensor-product monotone (PCHIP) interpolation of values given on
+    the grid axes, evaluated at point. One axis is reduced at a time.
+    """
+    y = values
+    for x, p in zip(axes, point):
+        y = PchipInterpolator(x, y, axis=0)(p)
+
+    return y
+
+
+def isotonic_decreasing(y):
+    """
+    Least-squares non-increasing fit to the sequence y by pooling
+    adjacent violators, so noisy nodes are averaged rather than clipped.
+    """
+    blocks = []
+    for v in y:
+        blocks.append([v, 1])
+        # Merge while the previous block's mean is below this one's
+        while (len(blocks) > 1 and
+               blocks[-2][0]*blocks[-1][1] < blocks[-1][0]*blocks[-2][1]):
+            total, n = blocks.pop()
+            blocks[-1][0] += total
+            blocks[-1][1] += n
+
+    return np.concatenate([np.repeat(total/float(n), n)
+                           for total, n in blocks])
+
+
+def how_much_to_save_replicates(n_solves, *args, **kwargs):
+    """
+    Solve how_much_to_save n_solves times with independent histories.
+
+    Inputs:
+
+       * n_solves : the number of independent solves, at least 2
+       * remaining arguments are passed to how_much_to_save
+
+    Output:
+
+       * starting_assets as a ufloat: the mean of the solves, with the
+           standard error of that mean as std_dev
+
+    """
+    if n_solves < 2:
+        raise ValueError('n_solves must be at least 2 to estimate '
+                         'the Monte Carlo error.')
+
+    saves = np.array([how_much_to_save(*args, **kwargs)
+                      for i in range(n_solves)])
+
+    return unc.ufloat(saves.mean(), saves.std(ddof=1)/np.sqrt(n_solves))
+
+
+def fit_surrogate(
+                  state_abbrev='CA',
+                  demographic_group='total',
+                  stock_fractions=np.linspace(0.0, 1.0, 6),
+                  starting_ages=np.linspace(40, 85, 10),
+                  acceptable_risks=np.logspace(-3, -0.2, 7),
+                  n_mc=2000,
+                  n_solves=4,
+                  variance_reduction='stratified',
+                  verbose=False):
+    """
+    Solve how_much_to_save on a grid and store a surrogate for
+    lookup_how_much_to_save.
+
+    The simulation is homogeneous in money: scaling yearly_expense and
+    starting_assets together leaves the chance of running out of money
+    unchanged. The surrogate therefore stores the savings needed in
+    years of expenses over (stock_fraction, starting_age,
+    log acceptable_risk), and any yearly_expense is exact.
+
+    Each node is the mean of n_solves independent solves. Accepting
+    more risk never needs more savings, so the nodes are made
+    non-increasing in risk by isotonic regression; no monotonicity is
+    imposed along stock_fraction or starting_age.
+
+    Two relative errors are stored per node and interpolated to each
+    query point: the Monte Carlo standard error of the node, and the
+    interpolation error, found by refitting without the node along each
+    axis and predicting it. Leaving a node out doubles the local grid
+    spacing, so the interpolation error is on the conservative side.
+    lookup_how_much_to_save combines them into a 1-sigma error.
+
+    Inputs:
+
+       * state_abbrev : mailing abbreviation for the state in which the subject lives
+       * demographic_group : the subject's demographic group accepted by
+                               cdc_life_tables.life_table
+       * stock_fractions : grid of fractions of money invested in stocks
+       * starting_ages : grid of ages at which withdraws start
+       * acceptable_risks : grid of probabilities of running out of money
+       * n_mc : the number of Monte Carlo histories per solve
+       * n_solves : the number of independent solves per node
+       * variance_reduction : sampling scheme, see uniform_draws
+       * verbose : produce verbose diagnostic messages
+
+    Output:
+       * name of the file holding the surrogate
+
+    """
+
+    reference_expense = 40e3
+
+    axes = [np.sort(stock_fractions),
+            np.sort(starting_ages),
+            np.log(np.sort(acceptable_risks))]
+
+    years = np.empty([x.size for x in axes])
+    mc_error = np.empty_like(years)
+
+    for i, stock_fraction in enumerate(axes[0]):
+        for j, starting_age in enumerate(axes[1]):
+            for k, log_risk in enumerate(axes[2]):
+                save = how_much_to_save_replicates(
+                                        n_solves,
+                                        np.exp(log_risk),
+                                        reference_expense,
+                                        stock_fraction,
+                                        starting_age,
+                                        state_abbrev,
+                                        demographic_group,
+                                        n_mc=n_mc,
+                                        variance_reduction=variance_reduction)
+                years[i, j, k] = save.nominal_value / reference_expense
+                mc_error[i, j, k] = save.std_dev / save.nominal_value
+
+        if verbose:
+            print(' Surrogate: {} of {} stock fractions done'.format(
+                                                       i+1, axes[0].size))
+
+    # Accepting more risk never needs more savings; pool MC noise
+    # that says otherwise so the interpolant is monotone in risk.
+    years = np.apply_along_axis(isotonic_decreasing, 2, years)
+
+    # Leave-one-out estimate of the interpolation error at each node:
+    # refit along each axis without the node and predict it. End nodes
+    # cannot be left out, so they take their neighbour's estimate.
+    interp_error = np.zeros_like(years)
+    for axis, x in enumerate(axes):
+        if x.size < 3: continue
+
+        axis_error = np.empty_like(years)
+        for i in range(1, x.size-1):
+            keep = np.delete(np.arange(x.size), i)
+            fit = PchipInterpolator(x[keep], years.take(keep, axis=axis),
+                                    axis=axis)
+            actual = years.take(i, axis=axis)
+            index = [slice(None)]*years.ndim
+            index[axis] = i
+            axis_error[tuple(index)] = np.abs(fit(x[i]) - actual) / actual
+
+        for end, neighbour in [(0, 1), (x.size-1, x.size-2)]:
+            index = [slice(None)]*years.ndim
+            index[axis] = end
+            source = list(index)
+            source[axis] = neighbour
+            axis_error[tuple(index)] = axis_error[tuple(source)]
+
+        interp_error = np.maximum(interp_error, axis_error)
+
+    if not os.path.isdir(surrogate_dir):
+        os.mkdir(surrogate_dir)
+
+    fname = surrogate_file(state_abbrev, demographic_group)
+    np.savez(fname,
+             stock_fractions=axes[0],
+             starting_ages=axes[1],
+             log_risks=axes[2],
+             years=years,
+             mc_error=mc_error,
+             interp_error=interp_error)
+
+    surrogate_cache.pop(fname, None)
+
+    if verbose:
+        print(' Surrogate saved to {}, median relative errors: '
+              'interpolation {:.1%}, MC {:.1%}'.format(
+                     fname, np.median(interp_error), np.median(mc_error)))
+
+    return fname
+
+
+def lookup_how_much_to_save(
+                            acceptable_risk=0.01,
+                            yearly_expense=40e3,
+                            stock_fraction=0.5,
+                            starting_age=65,
+                            state_abbrev='CA',
+                            demographic_group='total',
+                            n_mc=500, n_solves=4, verbose=False):
+    """
+    Fast version of how_much_to_save using the surrogate stored by
+    fit_surrogate. Falls back to how_much_to_save when there is no
+    surrogate for the life table or the inputs are outside its grid.
+
+    Inputs:
+
+       * same as how_much_to_save; n_mc is only used for the fallback
+       * n_solves : the number of independent solves in the fallback,
+                      used for its Monte Carlo error. With 1, the
+                      fallback runs a single solve and its error is NaN.
+
+    Output:
+
+       * starting_assets : amount of initial savings to invest for income,
+                             as a ufloat whose std_dev is a 1-sigma
+                             relative error times the savings. It adds
+                             in quadrature the Monte Carlo and
+                             interpolation errors stored by fit_surrogate
+                             and the solver tolerance, taken as uniform
+                             (save_rtol/sqrt(3)). It is an estimate,
+                             not a bound.
+
+    """
+
+    fname = surrogate_file(state_abbrev, demographic_group)
+
+    if fname not in surrogate_cache:
+        if os.path.exists(fname):
+            with np.load(fname) as data:
+                surrogate_cache[fname] = dict(data)
+        else:
+            # Remember the miss so the warning is given only once
+            surrogate_cache[fname] = None
+            warnings.warn('No surrogate in {}; run fit_surrogate. Falling '
+                          'back to how_much_to_save.'.format(fname),
+                          stacklevel=2)
+
+    surrogate = surrogate_cache.get(fname)
+
+    if surrogate is not None:
+        axes = [surrogate['stock_fractions'],
+                surrogate['starting_ages'],
+                surrogate['log_risks']]
+        point = [stock_fraction, starting_age, np.log(acceptable_risk)]
+
+        inside = all(x[0] <= p <= x[-1] for x, p in zip(axes, point))
+
+        if inside:
+            years = surrogate_interp(axes, surrogate['years'], point)
+            mc_error = surrogate_interp(axes, surrogate['mc_error'], point)
+            interp_error = surrogate_interp(axes, surrogate['interp_error'],
+                                            point)
+            rel_error = np.sqrt(mc_error**2 + interp_error**2
+                                + save_rtol**2/3.0)
+
+            save = float(years) * yearly_expense
+            return unc.ufloat(save, save*float(rel_error))
+
+        if verbose:
+            print(' Inputs outside the surrogate, running the simulation.')
+
+    if n_solves == 1:
+        save = how_much_to_save(acceptable_risk, yearly_expense,
+                                stock_fraction, starting_age, state_abbrev,
+                                demographic_group, n_mc=n_mc)
+        return unc.ufloat(save, np.nan)
+
+    save = how_much_to_save_replicates(n_solves, acceptable_risk,
+                                       yearly_expense, stock_fraction,
+                                       starting_age, state_abbrev,
+                                       demographic_group, n_mc=n_mc)
+
+    return unc.ufloat(save.nominal_value,
+                      np.sqrt(save.std_dev**2
+                              + (save_rtol*save.nominal_value)**2/3.0))
 
 
 def cascade_plot(yearly_expense,
@@ -330,6 +881,7 @@ def sensitivity_plots(
                       stock_fraction=0.5,
                       stock_fractions=np.linspace(0.0, 1.0, 11),
                       n_mc=5000,
+                      surrogate=False,
                       verbose=False):
     """
     Inputs:
@@ -345,6 +897,8 @@ def sensitivity_plots(
                                cdc_life_tables.life_table
        * n_mc : the number of Monte Carlo histories
        * plotting : produce a plot showing the Monte Carlo histories
+       * surrogate : use lookup_how_much_to_save instead of solving
+                       every point from scratch
        * verbose : produce verbose diagnostic messages
 
     Output:
@@ -352,6 +906,14 @@ def sensitivity_plots(
 
     """
 
+    if surrogate:
+        # Only the nominal value is plotted, so a fallback needs one solve
+        solve = lambda **opts: lookup_how_much_to_save(
+                                   n_solves=1, verbose=verbose,
+                                   **opts).nominal_value
+    else:
+        solve = how_much_to_save
+
     factors = { 
                 'stock_fraction'  : {'value' : stock_fraction,  'values' : stock_fractions },
                 'acceptable_risk' : {'value' : acceptable_risk, 'values' : acceptable_risks },
@@ -372,7 +934,7 @@ def sensitivity_plots(
                   'demographic_group' : demographic_group,
                 }
 
-    base_save = how_much_to_save(**base_opts)/1e6
+    base_save = solve(**base_opts)/1e6
 
     for i, factor in enumerate(factors.keys()):
 
@@ -384,7 +946,7 @@ def sensitivity_plots(
 
             opts[factor] = factor_value
 
-            factor_res.append( how_much_to_save(**opts)/1e6 )
+            factor_res.append( solve(**opts)/1e6 )
 
 
         axs[i].plot(factors[factor]['values'], factor_res,